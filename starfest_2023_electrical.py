@@ -3,60 +3,49 @@ Draws 2 maps of the 2023 Starfest electrical grid
 """
 
 import cv2      # type: ignore
-import copy
+from concurrent.futures import ThreadPoolExecutor
+import functools
+from dataclasses import dataclass
 import numpy as np
-import numpy.typing as npt
-from typing import Optional, Callable, Any, Iterable, Tuple, TypeAlias, List
-import typing
+from typing import Optional, Any, Callable, Iterable, Tuple, TypeAlias, Dict
 
 # Closest I can get for mypy types on the numpy stuff :(
 # email andrew.brownbill@gmail.com if you know how to do this?
 Vector:         TypeAlias = 'np.ndarray[Any, Any ]'
 Matrix:         TypeAlias = 'np.ndarray[Any, Any ]'
 Image:          TypeAlias = 'np.ndarray[Any, Any ]'
+Pixels:         TypeAlias = 'np.ndarray[Any, Any ]'   # (N,2) contiguous int32, as OpenCV takes points
 
 # For type checking with mypy
 Pixel=          tuple[int, int]
 Color=          tuple[int, int, int]
-CoordToPixel=   Callable[ [Vector], Pixel]
 
+@dataclass( slots=True, frozen=True )
 class MapFeature:
-  def __init__( self, 
-      name:           str,
-      feature_type:   str, 
-      long:           float, 
-      lat:            float, 
-      map_name:       str, 
-      destination:    Optional[str], 
-      usage:          Optional[int], 
-      pixel:          Optional[Pixel] 
-    ):
-    """
-    Features on the electrical grid maps
-
-    name:         The name of the feature.  i.e., "L1", "Post 1"
-    type:         The type of feature.  i.e., "Spool", "Mat"
-    coord:        The GPS co-ordinate of the feature
-    map_name:     The map the feature is on "i.e., "map1", "map2"
-    destination:  What does the feature connect to?  Used for line drawing
-                  for power connections, the tent, and the road
-    users_2023:   Number of users a spool had at Starfest 2023
-    pixel:        Location of feature on the map image, if known.
-    """
-    self.name         = name
-    self.type         = feature_type
-    self.coord        = np.array( [long, lat], np.float64 )
-    self.map_name     = map_name
-    self.destination  = destination
-    self.users_2023   = usage
-    if pixel:
-      (x, y) = pixel
-      self.pixel    = np.array( [x, y], np.float64 )
-
-# Type checking that depends on MapFeature
-MapFeatures =     List[ MapFeature ]    # Explicitely list and not iterable
-FeatureFilter =   Callable[ [MapFeature], bool ]
-FeatureDrawer=    Callable[ [MapFeature, Pixel, Optional[Pixel]], None]
+  """
+  Features on the electrical grid maps
+
+  name:         The name of the feature.  i.e., "L1", "Post 1"
+  type:         The type of feature.  i.e., "Spool", "Mat"
+  long, lat:    The GPS co-ordinate of the feature
+  map_name:     The map the feature is on "i.e., "map1", "map2"
+  destination:  What does the feature connect to?  Used for line drawing
+                for power connections, the tent, and the road
+  users_2023:   Number of users a spool had at Starfest 2023
+  pixel:        Location of feature on the map image, if known.
+  """
+  name:           str
+  type:           str
+  long:           float
+  lat:            float
+  map_name:       str
+  destination:    Optional[str]
+  users_2023:     Optional[int]
+  pixel:          Optional[Pixel]
+
+# Features are passed around as row indices into the arrays built from MAP_FEATURES
+FeatureIndices =  Vector                # Integer array of rows
+FeaturesByType =  Dict[ str, Vector ]   # Feature type to the indices of features of that type
 
 MAP_FEATURES = [
   #
@@ -132,28 +121,55 @@ MAP_FEATURES = [
   MapFeature("RC4",   "Road",    44.073790, -80.840477,  "map1", "RC3",     None, None),
 ]
 
-def compute_coord_to_pixel_function(
-    entry1:   MapFeature, 
-    entry2:   MapFeature, 
-    basis:    MapFeature 
-  ) -> CoordToPixel:
-  """
-  Computes a function that maps coordinates (degrees) to pixel
-  locations on a map given three MapFeature records.
+#
+# MAP_FEATURES as parallel arrays, one row per feature.  Built once at import
+# so the drawing code can work on row indices instead of MapFeature objects.
+#
+# PIXELS_KNOWN is NaN for features that don't bind a pixel location
+# DEST_IDX is the row of the feature's destination, or -1 if it has none
+#
+NAMES         = np.array( [ f.name for f in MAP_FEATURES ] )
+TYPES         = np.array( [ f.type for f in MAP_FEATURES ] )
+MAP_OF        = np.array( [ f.map_name for f in MAP_FEATURES ] )
+COORDS        = np.array( [ ( f.long, f.lat ) for f in MAP_FEATURES ], np.float64 )
+PIXELS_KNOWN  = np.array( [ f.pixel if f.pixel else ( np.nan, np.nan ) 
+                            for f in MAP_FEATURES ], np.float64 )
+NAME_TO_IDX   = { f.name: i for i, f in enumerate( MAP_FEATURES ) }
+assert len( NAME_TO_IDX ) == len( MAP_FEATURES ), "Map Feature names must be unique"
+
+# Destinations have to be on the same map as the feature that uses them
+for feature in MAP_FEATURES:
+  if feature.destination:
+    assert feature.destination in NAME_TO_IDX and \
+        MAP_OF[ NAME_TO_IDX[ feature.destination ] ] == feature.map_name, \
+        "Map Feature " + feature.destination + " not found on " + feature.map_name
+
+DEST_IDX      = np.array( [ NAME_TO_IDX[ f.destination ] if f.destination else -1
+                            for f in MAP_FEATURES ], np.int32 )
+
+def compute_map_pixels(
+    entry1:   int, 
+    entry2:   int, 
+    basis:    int 
+  ) -> Pixels:
+  """
+  Computes the pixel location of every feature given the indices of
+  three marker features on a map.
   
   1. Compute degree and pixel vectors from basis to entry
   2. Find a 2x2 matrix, M, to map degree vectors to pixel vectors
-  3. Helper function to map degrees to pixels given M and the basis
-  4. Capture M and the Basis in a lambda and return it
+  3. Map every feature's coordinate to a pixel in one matrix multiply
+
+  Only the rows for features on the same map as the markers are meaningful.
   """
 
   """
   1. Compute degree and pixel vectors from basis to entry
   """
-  deg_vec_0: Vector = entry1.coord - basis.coord
-  deg_vec_1: Vector = entry2.coord - basis.coord
-  pixel_vec_0 = entry1.pixel - basis.pixel
-  pixel_vec_1 = entry2.pixel - basis.pixel
+  deg_vec_0: Vector = COORDS[ entry1 ] - COORDS[ basis ]
+  deg_vec_1: Vector = COORDS[ entry2 ] - COORDS[ basis ]
+  pixel_vec_0 = PIXELS_KNOWN[ entry1 ] - PIXELS_KNOWN[ basis ]
+  pixel_vec_1 = PIXELS_KNOWN[ entry2 ] - PIXELS_KNOWN[ basis ]
 
   """
   2. Find a 2x2 matrix, M, to map degree vectors to pixel vectors
@@ -166,176 +182,180 @@ def compute_coord_to_pixel_function(
   M * M_Degree = M_Pixel
   M * M_Degree * M_Degree_inv = M_Pixel * M_Degree_Inv
   M = MPixel * M_Degree_Inv
-  """
-  M_Degree     = np.transpose(np.array( [deg_vec_0, deg_vec_1] ))
-  M_Pixel      = np.transpose(np.array( [pixel_vec_0, pixel_vec_1] ))
-  M_Degree_Inv = np.linalg.inv( M_Degree ) #type: ignore[no-untyped-call]
-  M = np.matmul( M_Pixel, M_Degree_Inv )
 
-  """
-  3. Helper function to map degrees to pixels given M and the basis
-  """
-  def coord_to_pixel_helper( 
-      coord : Vector,
-      M     : Matrix,
-      basis : MapFeature 
-    ) -> Pixel:
-    pixel = M.dot(coord - basis.coord) + basis.pixel
-    return ( int( pixel[0] ), int( pixel[1] ) )
+  M_Degree is 2x2, so M_Degree_Inv is written out in closed form
+  instead of going through np.linalg.inv:
 
+  M_Degree     = | a c |    M_Degree_Inv = |  d -c | / ( a*d - b*c )
+                 | b d |                   | -b  a |
   """
-  4. Capture M and the Basis in a lambda and return it
-  """
-  return lambda coord : coord_to_pixel_helper( coord, M, basis )
-
+  ( a, b )     = ( float( deg_vec_0[0] ), float( deg_vec_0[1] ) )
+  ( c, d )     = ( float( deg_vec_1[0] ), float( deg_vec_1[1] ) )
+  ( p0x, p0y ) = ( float( pixel_vec_0[0] ), float( pixel_vec_0[1] ) )
+  ( p1x, p1y ) = ( float( pixel_vec_1[0] ), float( pixel_vec_1[1] ) )
+  det = a*d - b*c
+  M: Matrix = np.array( [
+      [ ( d*p0x - b*p1x ) / det, ( -c*p0x + a*p1x ) / det ],
+      [ ( d*p0y - b*p1y ) / det, ( -c*p0y + a*p1y ) / det ] ] )
 
-def find_map_entry( 
-    features:   MapFeatures, 
-    name:       str 
-  ) -> MapFeature:
-  """
-  Finds a named feature in a list of features.
-  
-  Note: The linear search is inefficint but the data set is small
   """
-  try:
-    return next(filter(lambda feature: feature.name == name, features))
-  except StopIteration:
-    assert False, "Map Feature " + name + " not found"
+  3. Map every feature's coordinate to a pixel in one matrix multiply
 
-def get_destination_pixel( 
-    map_features:       MapFeatures, 
-    destination_name:   Optional[str], 
-    coord_to_pixel:     CoordToPixel 
-  ) -> Optional[Pixel]:
-  """
-  Given a destination name, compute the pixel location of the destination
+  COORDS holds one coordinate per row, so M * deg_vec for every feature
+  is deg_vecs * M^T
   """
-  if destination_name:
-    destination_entry = find_map_entry( map_features, destination_name )
-    return coord_to_pixel( destination_entry.coord )
-  return None
+  pixels = ( COORDS - COORDS[ basis ] ) @ M.T + PIXELS_KNOWN[ basis ]
+  return np.rint( pixels ).astype( np.int32 )   # round to nearest, don't truncate
 
 
-def draw_features( 
-    map_features:     MapFeatures, 
-    coord_to_pixel:   CoordToPixel,
-    feature_filter:   FeatureFilter, 
-    feature_drawer:   FeatureDrawer 
-  ) -> None:
-  """
-  Draw some map features
-  
-  map_features    : complete list of features for the map we're drawing
-  coord_to_pixel  : function to map co-ordinates to pixel locations
-  feature_filter  : function that returns true if we're to draw this feature
-  feature_drawer  : The function that actually draws the feature
-  """
-  for feature in filter( feature_filter, map_features):
-      pixel = coord_to_pixel( feature.coord )
-      destination_pixel = get_destination_pixel( map_features, feature.destination, coord_to_pixel )
-      feature_drawer( feature, pixel, destination_pixel )
+# compute_map_pixels results, keyed by the ( entry1, entry2, basis ) markers used
+PIXELS_CACHE: Dict[ Tuple[ int, int, int ], Pixels ] = {}
 
-def filter_for_type(filter_type : str) -> FeatureFilter:
+def get_map_pixels(
+    entry1:   int, 
+    entry2:   int, 
+    basis:    int 
+  ) -> Pixels:
   """
-  Create a function that returns true if a feature is a particular type
-  """
-  return lambda feature: feature.type == filter_type
+  compute_map_pixels, but only computed once for each set of markers.
 
+  The cached array is shared, so it's made read only.
+  """
+  key = ( entry1, entry2, basis )
+  if key not in PIXELS_CACHE:
+    pixels = compute_map_pixels( entry1, entry2, basis )
+    pixels.setflags( write=False )
+    PIXELS_CACHE[ key ] = pixels
+  return PIXELS_CACHE[ key ]
 
-def filter_for_line(filter_type : str) -> FeatureFilter:
+def filter_features( 
+    map_name:   str 
+  ) -> Tuple[ FeatureIndices, Dict[ str, int ], FeaturesByType ]:
   """
-  Create a function that returns true if a feature is a type and has a destination
+  Finds all the features on a map.
+
+  Returns the feature indices, a name to index lookup, and the feature
+  indices bucketed by type for the features on the map.  Looking up a
+  name that isn't on the map raises a KeyError.  Every feature type has
+  a bucket, even if the map has no features of that type.
   """
-  return lambda feature: feature.type == filter_type and feature.destination is not None
+  map_features = np.flatnonzero( MAP_OF == map_name )
+  name_to_idx  = dict( zip( NAMES[ map_features ].tolist(), map_features.tolist() ) )
+  by_type      = { str( t ): map_features[ TYPES[ map_features ] == t ] for t in np.unique( TYPES ) }
+  return ( map_features, name_to_idx, by_type )
 
 
-def create_line_drawer( 
-    image:        Image, 
-    color:        Color, 
-    line_width:   int 
-  ) -> FeatureDrawer:
+def batched_line_endpoints( 
+    by_type:        FeaturesByType, 
+    pixels:         Pixels, 
+    feature_types:  Iterable[str] 
+  ) -> Tuple[ Pixels, Pixels, Vector ]:
   """
-  Create a function that draws a line for features with a destination
+  Gather the end points of the lines for all features of a set of types
+  that have a destination.
+
+  Returns ( starts, ends, names ), one row per line.
   """
-  return lambda feature, pixel, dest_pixel : cv2.line( 
-      image, pixel, dest_pixel, color, line_width )
+  empty = np.empty( 0, np.intp )    # no types, or a type with no bucket, draws nothing
+  features = np.concatenate( [ empty ] + [ by_type.get( feature_type, empty ) for feature_type in feature_types ] )
+  lines = features[ DEST_IDX[ features ] >= 0 ]
+  return ( pixels[ lines ], pixels[ DEST_IDX[ lines ] ], NAMES[ lines ] )
 
 
-def create_label_drawer( 
+def draw_labels( 
     image:    Image, 
+    names:    Vector, 
+    points:   Pixels, 
     color:    Color 
-  ) -> FeatureDrawer:
+  ) -> None:
   """
-  Create a function that uses the feature name to draw a label
+  Draws each name as a label next to its point
+
+  Features on the same pixel (i.e., L11 and L14) share one label, "L11/L14",
+  instead of drawing their names on top of each other.
   """
-  return lambda feature, pixel, dest_pixel: cv2.putText( 
-        image, feature.name, 
-        (pixel[0]+2, pixel[1]+9), 
-        cv2.FONT_HERSHEY_SIMPLEX, 1, color, 2, cv2.LINE_AA, False ) 
+  labels: Dict[ Pixel, list[str] ] = {}
+  for ( name, ( x, y ) ) in zip( names.tolist(), points.tolist() ):
+    labels.setdefault( ( x, y ), [] ).append( name )
 
+  put_text  = cv2.putText               # hoisted out of the loop
+  font      = cv2.FONT_HERSHEY_SIMPLEX
+  line_type = cv2.LINE_AA
+  for ( ( x, y ), label_names ) in labels.items():
+    put_text( image, "/".join( label_names ), ( x+2, y+9 ), font, 1, color, 2, line_type, False ) 
 
-def draw_crosshair( 
+
+def draw_crosshairs( 
     image:    Image, 
-    point:    Pixel, 
+    points:   Pixels, 
     color:    Color
   ) -> None:
   """
-  Draws a small crosshair at point
+  Draws a small crosshair at every point
+
+  Both strokes of every crosshair go to OpenCV in a single polylines call
   """
   line_width = 4
   cross_size = 3
-  ( x, y ) = point
-  lower_left  = ( x - cross_size, y - cross_size )
-  lower_right = ( x + cross_size, y - cross_size )
-  upper_left  = ( x - cross_size, y + cross_size )
-  upper_right = ( x + cross_size, y + cross_size )
+  lower_left  = points + ( -cross_size, -cross_size )
+  lower_right = points + (  cross_size, -cross_size )
+  upper_left  = points + ( -cross_size,  cross_size )
+  upper_right = points + (  cross_size,  cross_size )
 
-  cv2.line( image, lower_left, upper_right, color, line_width ) 
-  cv2.line( image, lower_right, upper_left, color, line_width ) 
+  segments = np.concatenate( [ 
+      np.stack( [ lower_left,  upper_right ], axis=1 ),
+      np.stack( [ lower_right, upper_left  ], axis=1 ) ] ).astype( np.int32, copy=False )
+  cv2.polylines( image, list( segments ), False, color, line_width, cv2.LINE_8 )   # stubs want a sequence of arrays
 
 
-def create_crosshair_drawer( 
-    image:            Image, 
-    color:            Color 
-  ) -> FeatureDrawer:
+def draw_labelled_crosshairs( 
+    image:          Image, 
+    features:       FeatureIndices, 
+    pixels:         Pixels, 
+    cross_color:    Color, 
+    label_color:    Color 
+  ) -> None:
   """
-  Create a function that draws a crosshair
+  Draws a crosshair and a name label for each feature.
+
+  The feature pixels are gathered once for both.  All the crosshairs are
+  drawn before any labels so no crosshair covers a neighbour's label.
   """
-  return lambda feature, pixel, dest_pixel: draw_crosshair( image, pixel, color ) 
+  points = pixels[ features ]
+  draw_crosshairs( image, points, cross_color )
+  draw_labels( image, NAMES[ features ], points, label_color )
 
 
 def draw_spools( 
     image:            Image, 
-    features:         MapFeatures, 
-    coord_to_pixel:   CoordToPixel 
+    by_type:          FeaturesByType, 
+    pixels:           Pixels 
   ) -> None:
   """
   Draw all the spools.
   """
   off_white = ( 228, 228, 228 )
   blue = ( 255, 0, 0 )
-  draw_features( features, coord_to_pixel, filter_for_type("Spool"), create_crosshair_drawer( image, blue ))
-  draw_features( features, coord_to_pixel, filter_for_type("Spool"), create_label_drawer( image, off_white ))
+  draw_labelled_crosshairs( image, by_type[ "Spool" ], pixels, blue, off_white )
 
 
 def draw_mats( 
     image:            Image, 
-    features:         MapFeatures, 
-    coord_to_pixel:   CoordToPixel 
+    by_type:          FeaturesByType, 
+    pixels:           Pixels 
   ) -> None:
   """
   Draw all the road mats.
   """
   off_white = ( 228, 228, 228 )
   blue      = ( 255, 0, 0 )
-  draw_features( features, coord_to_pixel, filter_for_type("Mat"), create_crosshair_drawer( image, blue ))
-  draw_features( features, coord_to_pixel, filter_for_type("Mat"), create_label_drawer( image, off_white ))
+  draw_labelled_crosshairs( image, by_type[ "Mat" ], pixels, blue, off_white )
 
 def draw_lines( 
     image:            Image, 
-    features:         MapFeatures, 
-    coord_to_pixel:   CoordToPixel, 
+    scratch:          Image, 
+    by_type:          FeaturesByType, 
+    pixels:           Pixels, 
     feature_types:    Iterable[str], 
     color:            Color, 
     alpha:            float, 
@@ -345,23 +365,38 @@ def draw_lines(
   Draw lines for a set of feature types.  Allows blending.
   
   image:            The image we're drawing onto
-  features:         Feature list
-  coord_to_pixel:   Function that convers GPS coordinate to pixels
+  scratch:          Buffer the same size as image, used for the overlay
+  by_type:          Feature indices by type
+  pixels:           Pixel location of every feature
   color:            Line color
   alpha:            Transparency.  0-1,  1 = full opaque
   width:            Line width
   """
 
   beta = 1-alpha
-  overlay = image.copy()  # draw lines to an overlay at 100% transparency, then blend the overlay and the original image
-  for feature_type in feature_types:
-    draw_features( features, coord_to_pixel, filter_for_line(feature_type), create_line_drawer( overlay, color, width ))
-  image = cv2.addWeighted( overlay, alpha, image, beta, 0, image )
+  ( starts, ends, _ ) = batched_line_endpoints( by_type, pixels, feature_types )
+  segments = np.stack( [ starts, ends ], axis=1 ).astype( np.int32, copy=False )
+  if len( segments ) == 0:
+    return
+
+  # Only pixels inside the bounding box of the lines can change, so only that
+  # region is copied and blended.  Pad by the line width to cover line ends.
+  ( height, image_width ) = image.shape[:2]
+  ( x0, y0 ) = np.maximum( segments.reshape( -1, 2 ).min( axis=0 ) - width, 0 )
+  ( x1, y1 ) = np.minimum( segments.reshape( -1, 2 ).max( axis=0 ) + width + 1, ( image_width, height ) )
+  roi = image[ y0:y1, x0:x1 ]
+
+  overlay = scratch[ y0:y1, x0:x1 ]  # draw lines to an overlay at 100% transparency, then blend the overlay and the original image
+  np.copyto( overlay, roi )
+  # every line for every type in one call.  no anti-aliasing needed under the blend
+  cv2.polylines( overlay, list( segments - ( x0, y0 ) ), False, color, width, cv2.LINE_8 )
+  cv2.addWeighted( overlay, alpha, roi, beta, 0, roi )
 
 def draw_roads( 
     image:          Image, 
-    features:       MapFeatures, 
-    coord_to_pixel: CoordToPixel 
+    scratch:        Image, 
+    by_type:        FeaturesByType, 
+    pixels:         Pixels 
   ) -> None:
   """
   Draw all the roads
@@ -369,25 +404,27 @@ def draw_roads(
   cyan = (128,128,0)
   alpha = .30              # draw roads with 30% transparency
   road_width = 20
-  draw_lines( image, features, coord_to_pixel, ["Road"], cyan, alpha, road_width )
+  draw_lines( image, scratch, by_type, pixels, ["Road"], cyan, alpha, road_width )
 
 def draw_tent( 
     image:          Image, 
-    features:       MapFeatures, 
-    coord_to_pixel: CoordToPixel 
+    scratch:        Image, 
+    by_type:        FeaturesByType, 
+    pixels:         Pixels 
   ) -> None:
   """
   Draw the tent
   """
   white = (255,255,255)
   alpha = .50             # draw tent at 50 percent tranparency
-  draw_lines( image, features, coord_to_pixel, ["Tent"], white, alpha )
+  draw_lines( image, scratch, by_type, pixels, ["Tent"], white, alpha )
 
 
 def draw_electric_cords( 
     image:          Image, 
-    features:       MapFeatures, 
-    coord_to_pixel: CoordToPixel 
+    scratch:        Image, 
+    by_type:        FeaturesByType, 
+    pixels:         Pixels 
   ) -> None:
   """
   Draw the electric grid
@@ -398,13 +435,13 @@ def draw_electric_cords(
   """
   blue = (255, 0, 0 )
   alpha = .50             # draw tent at 50 percent tranparency
-  draw_lines( image, features, coord_to_pixel, ["Spool", "Source", "Mat" ], blue, alpha )
+  draw_lines( image, scratch, by_type, pixels, ["Spool", "Source", "Mat" ], blue, alpha )
 
 
 def draw_all_features( 
     image:          Image, 
-    map_features:   MapFeatures, 
-    coord_to_pixel: CoordToPixel 
+    by_type:        FeaturesByType, 
+    pixels:         Pixels 
   ) -> None:
   """
   Draw everything on a map.
@@ -412,59 +449,111 @@ def draw_all_features(
   order matters. We want the labels for the mats and spools drawn
   after the road, electric cords, and tent so they show up well.
   """
-  draw_roads         ( image, map_features, coord_to_pixel )
-  draw_electric_cords( image, map_features, coord_to_pixel )
-  draw_tent          ( image, map_features, coord_to_pixel )
-  draw_mats          ( image, map_features, coord_to_pixel )
-  draw_spools        ( image, map_features, coord_to_pixel )
+  scratch = np.empty_like( image )    # overlay buffer, shared by all the line drawers
+  draw_roads         ( image, scratch, by_type, pixels )
+  draw_electric_cords( image, scratch, by_type, pixels )
+  draw_tent          ( image, scratch, by_type, pixels )
+  draw_mats          ( image, by_type, pixels )
+  draw_spools        ( image, by_type, pixels )
 
 
-def draw_map( map_name: str ) -> None:
+def draw_map_on( 
+    image:      Image, 
+    map_name:   str 
+  ) -> None:
   """
-  Draws one of the electric grid maps
+  Draws one of the electric grid maps onto its template image
   
-  1.  Load the map template from disk
-  2.  Find all the features for this map
-  3.  Compute a function that maps GPS coordinates to pixels
-  4.  Draw all the features for our map
-  5.  Save the new map
+  1.  Find all the features for this map
+  2.  Map the GPS coordinates of every feature to pixels
+  3.  Draw all the features for our map
   """
 
   """
-  1.  Load the map template from disk
+  1.  Find all the features for this map
   """
-  image = cv2.imread(map_name + ".png")
-  
+  ( _, name_to_idx, by_type ) = filter_features( map_name )
+
   """
-  2.  Find all the features for this map
+  2.  Map the GPS coordinates of every feature to pixels
   """
-  map_features = list(filter( lambda x: x.map_name == map_name, MAP_FEATURES ))
+  map_pixels = get_map_pixels(
+      name_to_idx[ map_name + "_mark0" ],
+      name_to_idx[ map_name + "_mark1" ],
+      name_to_idx[ map_name + "_mark2" ])
 
   """
-  3.  Compute a function that maps GPS coordinates to pixels
+  3.  Draw all the features for our map
   """
-  map_coord_to_pixel = compute_coord_to_pixel_function(
-      find_map_entry( map_features, map_name + "_mark0" ),
-      find_map_entry( map_features, map_name + "_mark1" ),
-      find_map_entry( map_features, map_name + "_mark2" ))
+  draw_all_features( image, by_type, map_pixels ) 
+
 
+def template_path( map_name: str ) -> str:
   """
-  4.  Draw all the features for our map
+  The file name of a map's template image
   """
-  draw_all_features( image, map_features, map_coord_to_pixel ) 
+  return map_name + ".png"
 
+
+def draw_and_save_map( 
+    image:      Optional[Image], 
+    map_name:   str, 
+    save:       Callable[ [str, Image], Any ] = cv2.imwrite 
+  ) -> Any:
   """
-  5.  Save the new map
+  Draws one of the electric grid maps onto its template image and saves it
+
+  image:      The map template, as read from template_path( map_name )
+  map_name:   The map we're drawing
+  save:       Called with the output file name and the drawn image.
+              Returns whatever save returns.
   """
-  cv2.imwrite(map_name + "_spool.png", image )
+  assert image is not None, "Map template " + template_path( map_name ) + " not found"
+  draw_map_on( image, map_name )
+  return save( map_name + "_spool.png", image )
+
+
+@functools.lru_cache( maxsize=None )
+def load_template( path: str ) -> Image:
+  """
+  Loads a map template image, decoding each file only once.
+
+  The cached image is shared, so it's made read only.  Copy it to draw on it.
+  """
+  template = cv2.imread( path )
+  assert template is not None, "Map template " + path + " not found"
+  template.setflags( write=False )
+  return template
+
+
+def draw_map( map_name: str ) -> None:
+  """
+  Draws one of the electric grid maps on a copy of its cached template
+  """
+  draw_and_save_map( load_template( template_path( map_name ) ).copy(), map_name )
 
 
 def main() -> None:
   """
   Draws both the Starfest electric grid maps
-  """
-  draw_map( "map1" )    # South Field
-  draw_map( "map2" )    # North Field
+
+  PNG decoding and encoding is most of the run time and OpenCV releases
+  the GIL while doing it, so the reads and writes go to a thread pool and
+  overlap with drawing.
+  """
+  map_names = [ 
+    "map1",   # South Field
+    "map2",   # North Field
+  ]
+  with ThreadPoolExecutor( len( map_names ) ) as pool:
+    # each template is read once per run, so skip load_template's cache and copy
+    templates = [ pool.submit( cv2.imread, template_path( map_name ) ) for map_name in map_names ]
+    save_on_pool: Callable[ [str, Image], Any ] = \
+        lambda path, image: pool.submit( cv2.imwrite, path, image )
+    saves = [ draw_and_save_map( template.result(), map_name, save_on_pool ) 
+              for ( map_name, template ) in zip( map_names, templates ) ]
+    for save in saves:
+      save.result()
 
 if __name__ == "__main__":
   main()